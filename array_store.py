@@ -0,0 +1,96 @@
+"""
+Struct-of-arrays vector store: one embedding matrix, one text list and one page array
+"""
+
+import os
+import json
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.parquet"
+SCORE_BLOCK_ROWS = 4096  # Rows upcast to float32 at a time when scoring a float16 matrix
+
+
+class ArrayVectorStore:
+    def __init__(self, embeddings: np.ndarray, texts, pages: np.ndarray, metadatas):
+        """
+        Initialize the store from column arrays
+
+        Args:
+            embeddings: (N, dim) float32 or float16 matrix of L2-normalized embeddings
+                (may be memory-mapped)
+            texts: N chunk texts
+            pages: (N,) int32 page numbers (-1 if unknown)
+            metadatas: N JSON-encoded metadata dicts (without the page)
+        """
+        self.embeddings = embeddings
+        self.texts = texts
+        self.pages = pages
+        self.metadatas = metadatas
+
+    @classmethod
+    def create(cls, path: str, texts, embeddings, metadatas, dtype: str = "float32"):
+        """Save chunks and their embeddings (stored as dtype) under path and return the loaded store"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, EMBEDDINGS_FILE), np.asarray(embeddings, dtype=dtype))
+
+        pages = [metadata.get("page", -1) for metadata in metadatas]
+        table = pa.table({
+            "text": texts,
+            "page": np.asarray(pages, dtype=np.int32),
+            "metadata": [
+                json.dumps({key: value for key, value in metadata.items() if key != "page"})
+                for metadata in metadatas
+            ]
+        })
+        pq.write_table(table, os.path.join(path, CHUNKS_FILE))
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Load a store saved by create(), memory-mapping the embedding matrix"""
+        embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        table = pq.read_table(os.path.join(path, CHUNKS_FILE))
+        return cls(
+            embeddings,
+            table.column("text").to_pylist(),
+            table.column("page").to_numpy(),
+            table.column("metadata").to_pylist()
+        )
+
+    def _document(self, i: int) -> Document:
+        """Build the Document for row i"""
+        metadata = json.loads(self.metadatas[i])
+        if self.pages[i] >= 0:
+            metadata["page"] = int(self.pages[i])
+        return Document(page_content=self.texts[i], metadata=metadata)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Inner products of every row with query, computed in float32"""
+        if self.embeddings.dtype == np.float32:
+            return self.embeddings @ query
+
+        # BLAS has no mixed-precision product: upcast block by block to bound memory
+        scores = np.empty(len(self.embeddings), dtype=np.float32)
+        for start in range(0, len(self.embeddings), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    def similarity_search_with_score_by_vector(self, embedding, k: int = 4):
+        """Return the k most similar chunks with their cosine similarity"""
+        scores = self._scores(np.asarray(embedding, dtype=np.float32))
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._document(i), float(scores[i])) for i in top]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4):
+        """Return the k most similar chunks"""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
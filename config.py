@@ -9,7 +9,31 @@ os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
 # RAG Configuration
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+PDF_CACHE_DIR = "./.cache_pdf"  # On-disk cache of parsed and split PDF chunks
 TEMPERATURE = 0.1
-TOP_K = 10  # Number of relevant chunks to retrieve
+CANDIDATE_K = 20  # Number of chunks retrieved before trimming the context
+MIN_K = 3  # Chunks always passed to the LLM
+MAX_K = 10  # Upper bound on chunks passed to the LLM
+RELEVANCE_RATIO = 0.85  # Beyond MIN_K, keep chunks scoring at least this fraction of the best match
+QUERY_CACHE_SIZE = 512  # Number of questions kept in the embedding/retrieval/answer caches
+SEMANTIC_CACHE_THRESHOLD = 0.95  # Cosine similarity above which a past question's answer is reused
 
+# Embedding Configuration
+# all-MiniLM-L6-v2: 384-d, ~2x faster to embed and half the index size of all-mpnet-base-v2 (768-d),
+# at slightly lower retrieval quality. The vector store is rebuilt automatically after switching.
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"  # or "sentence-transformers/all-mpnet-base-v2"
+EMBEDDING_BACKEND = "auto"  # "auto" (torch on GPU, onnx on CPU), "onnx" (INT8-quantized ONNX Runtime) or "torch"
+EMBEDDING_DEVICE = "auto"  # "auto" (cuda > mps > cpu), or an explicit torch device for the torch backend
+TORCH_ENCODE_BATCH_SIZE = 256  # Sequences per forward pass for the torch backend
+TORCH_COMPILE = True  # Compile the torch backend with torch.compile (falls back to eager if unsupported)
+EMBEDDING_MAX_SEQ_LENGTH = None  # Maximum tokens per chunk/question; None uses the model's own limit (MiniLM 256, MPNet 384)
+EMBEDDING_BATCH_SIZE = 1024  # Chunks embedded per length-sorted batch when building the vector store
+ONNX_MODEL_DIR = "./onnx_models"  # Exported ONNX models (auto-created on first run)
 
+# Vector Store Configuration
+VECTOR_STORE = "array"  # "array" (memory-mapped NumPy matrix), "faiss" (in-memory index) or "chroma" (ChromaDB)
+CHROMA_COLLECTION = "langchain"  # Collection name (LangChain's default, so older chroma_db stores still load)
+CHROMA_BATCH_SIZE = 5000  # Chunks per collection.add() call, below Chroma's SQLite batch limit
+FAISS_INDEX = "flat"  # "flat" (exact IndexFlatIP) or "hnsw" (approximate IndexHNSWFlat)
+FAISS_HNSW_M = 32  # Neighbours per node in the HNSW graph
+EMBEDDING_STORAGE_DTYPE = "float16"  # "float16" halves the stored vectors (scored in float32); Chroma always stores float32
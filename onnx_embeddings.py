@@ -0,0 +1,94 @@
+"""
+INT8-quantized ONNX Runtime embeddings for sentence-transformers models
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+from huggingface_hub import hf_hub_download
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+
+QUANTIZED_FILE_NAME = "model_quantized.onnx"
+SENTENCE_BERT_CONFIG = "sentence_bert_config.json"
+
+
+class ONNXEmbeddings(Embeddings):
+    def __init__(self, model_name: str, cache_dir: str = "./onnx_models",
+                 max_seq_length: int = None, batch_size: int = 32):
+        """
+        Load (exporting and quantizing on first use) a sentence-transformers model
+
+        Args:
+            model_name: HuggingFace model id, e.g. sentence-transformers/all-MiniLM-L6-v2
+            cache_dir: Directory holding the exported ONNX models
+            max_seq_length: Maximum number of tokens per text (default: the model's own limit)
+            batch_size: Number of texts encoded per ONNX Runtime call
+        """
+        self.model_name = model_name
+        self.model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        self.batch_size = batch_size
+
+        if not os.path.exists(os.path.join(self.model_dir, QUANTIZED_FILE_NAME)):
+            self._export()
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = os.cpu_count() or 1
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            self.model_dir,
+            file_name=QUANTIZED_FILE_NAME,
+            session_options=session_options
+        )
+        self.max_seq_length = max_seq_length or self._default_max_seq_length()
+
+    def _default_max_seq_length(self) -> int:
+        """The model's max_seq_length from sentence_bert_config.json, else the tokenizer limit"""
+        path = os.path.join(self.model_dir, SENTENCE_BERT_CONFIG)
+        if not os.path.exists(path):
+            try:
+                shutil.copy(hf_hub_download(self.model_name, SENTENCE_BERT_CONFIG), path)
+            except OSError:  # Not a sentence-transformers repo, or offline
+                return self.tokenizer.model_max_length
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["max_seq_length"]
+
+    def _export(self):
+        """Export the PyTorch model to ONNX and apply dynamic INT8 quantization"""
+        model = ORTModelForFeatureExtraction.from_pretrained(self.model_name, export=True)
+        model.save_pretrained(self.model_dir)
+        AutoTokenizer.from_pretrained(self.model_name).save_pretrained(self.model_dir)
+
+        quantizer = ORTQuantizer.from_pretrained(self.model_dir)
+        quantization_config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=self.model_dir, quantization_config=quantization_config)
+
+    def _encode(self, texts):
+        """Mean-pool token embeddings and L2-normalize (matches sentence-transformers)"""
+        inputs = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        token_embeddings = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        """Embed a list of texts"""
+        embeddings = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._encode(texts[start:start + self.batch_size]).tolist())
+        return embeddings
+
+    def embed_query(self, text):
+        """Embed a single query"""
+        return self._encode([text])[0].tolist()
@@ -1,150 +1,829 @@
 """
 RAG System for "The War of the Worlds" by H.G. Wells
-Using Google Gemini API and ChromaDB
+Using Google Gemini API and a NumPy, FAISS or ChromaDB vector store
 """
 
 import os
+import asyncio
+import hashlib
+import inspect
+import io
+import json
+import traceback
+import threading
+from functools import lru_cache
+import chromadb
+import faiss
+import numpy as np
+import torch
 import google.generativeai as genai
+from joblib import Memory
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_chroma import Chroma
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
 from langchain_huggingface import HuggingFaceEmbeddings
+from array_store import ArrayVectorStore
 import config
 
 
+# Supported config.VECTOR_STORE values and their display names
+VECTOR_STORES = {"array": "NumPy", "faiss": "FAISS", "chroma": "ChromaDB"}
+
+# Written next to each vector store: the embedding model and dimension it was built with
+STORE_INFO_FILE = "store_info.json"
+
+PROMPT_HEAD = """You are an expert on the book "The War of the Worlds" by H.G. Wells.
+Use the following pieces of context from the book to answer the question at the end.
+If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
+Always answer in English and provide detailed, accurate responses based on the book's content.
+
+Context from the book:
+"""
+
+PROMPT_TAIL = """
+
+Question: {question}
+
+Detailed Answer:"""
+
+
+def select_device() -> str:
+    """Pick the fastest available torch device for the embedding model"""
+    if config.EMBEDDING_DEVICE != "auto":
+        return config.EMBEDDING_DEVICE
+    if torch.cuda.is_available():
+        return "cuda"
+    if torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+def sentence_transformer(embeddings: HuggingFaceEmbeddings):
+    """Return the SentenceTransformer wrapped by HuggingFaceEmbeddings"""
+    return getattr(embeddings, "_client", None) or embeddings.client
+
+
+SEPARATORS = ("\n\n", "\n", " ")
+
+
+def split_text(text: str, chunk_size: int, chunk_overlap: int):
+    """
+    Split text into chunks of at most chunk_size characters overlapping by about chunk_overlap
+    
+    Each chunk ends at the last paragraph break in its window, else the last line
+    break, else the last space, else at chunk_size. All scanning is done with the
+    C-implemented str.rfind/str.find instead of recursive Python-level splitting.
+    """
+    if chunk_overlap >= chunk_size:
+        raise ValueError("chunk_overlap must be smaller than chunk_size")
+    
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length:
+            # Only break past the overlap so the next chunk always moves forward
+            for separator in SEPARATORS:
+                cut = text.rfind(separator, start + chunk_overlap + 1, end)
+                if cut != -1:
+                    end = cut
+                    break
+        
+        chunk = text[start:end].strip()
+        if chunk:
+            yield chunk
+        if end >= length:
+            break
+        
+        # Step back by the overlap, then forward to the start of the next word
+        start = end - chunk_overlap
+        space = text.find(" ", start, end)
+        if space != -1:
+            start = space + 1
+
+
+# Source of the splitter and its separators, so any change to them invalidates _load_chunks
+SPLITTER_KEY = (inspect.getsource(split_text), SEPARATORS)
+
+_memory = Memory(location=config.PDF_CACHE_DIR, verbose=0)
+
+
+@_memory.cache
+def _load_chunks(pdf_path: str, mtime: float, size: int, chunk_size: int, chunk_overlap: int,
+                 splitter_key):
+    """
+    Load a PDF and split it into chunks
+    
+    mtime, size and splitter_key are unused in the body; they are part of the cache key so
+    that editing the PDF or the splitter (joblib only hashes this function's own code)
+    invalidates the cached chunks.
+    
+    Returns:
+        (page count, list of (page_content, metadata) tuples)
+    """
+    documents = PyPDFLoader(pdf_path).load()
+    chunks = [
+        (text, dict(document.metadata))
+        for document in documents
+        for text in split_text(document.page_content, chunk_size, chunk_overlap)
+    ]
+    return len(documents), chunks
+
+
 class RAGSystem:
-    def __init__(self, pdf_path: str, persist_directory: str = "./chroma_db", verbose: bool = True):
+    def __init__(self, pdf_path: str, persist_directory: str = None, verbose: bool = True):
         """
         Initialize RAG System
         
         Args:
             pdf_path: Path to the PDF file
-            persist_directory: Directory to persist ChromaDB
+            persist_directory: Directory to persist the vector store (default: ./<VECTOR_STORE>_db)
             verbose: Whether to print status messages
         """
+        if config.VECTOR_STORE not in VECTOR_STORES:
+            raise ValueError(
+                f"Unknown VECTOR_STORE {config.VECTOR_STORE!r}; expected one of: {', '.join(VECTOR_STORES)}"
+            )
         self.pdf_path = pdf_path
-        self.persist_directory = persist_directory
+        self.persist_directory = persist_directory or f"./{config.VECTOR_STORE}_db"
         self.vectorstore = None
         self.verbose = verbose
         
         # Configure Gemini
         genai.configure(api_key=config.GOOGLE_API_KEY)
         self.model = genai.GenerativeModel('models/gemini-2.5-flash')
+        self.generation_config = genai.types.GenerationConfig(
+            temperature=config.TEMPERATURE
+        )
         
-        # Initialize HuggingFace Embeddings (free and high-performance)
+        # Initialize embeddings: PyTorch on GPU, INT8 ONNX Runtime on CPU (unless configured)
         if self.verbose:
             print("🔄 Loading embedding model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-mpnet-base-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+        device = select_device()
+        backend = config.EMBEDDING_BACKEND
+        if backend == "auto":
+            backend = "onnx" if device == "cpu" else "torch"
+        if backend == "onnx":
+            from onnx_embeddings import ONNXEmbeddings
+            self.embeddings = ONNXEmbeddings(
+                model_name=config.EMBEDDING_MODEL,
+                cache_dir=config.ONNX_MODEL_DIR,
+                max_seq_length=config.EMBEDDING_MAX_SEQ_LENGTH
+            )
+        else:
+            self.embeddings = self._load_torch_embeddings(device)
         if self.verbose:
             print("✅ Embedding model loaded")
         
-    def load_and_process_pdf(self):
-        """Load PDF and split into chunks"""
-        if self.verbose:
-            print("📄 Loading PDF...")
-        loader = PyPDFLoader(self.pdf_path)
-        documents = loader.load()
+        # Cache query embeddings and retrieval results for repeated questions
+        self._embed_cached = lru_cache(maxsize=config.QUERY_CACHE_SIZE)(self._embed_query)
+        self._retrieve_cached = lru_cache(maxsize=config.QUERY_CACHE_SIZE)(self._retrieve)
+        
+        # Semantic answer cache: a ring buffer of answered-question embeddings (allocated on
+        # first insert) with their results, mirrored to an append-only file on disk
+        self._qcache_emb = None
+        self._qcache_entries = []
+        self._qcache_next = 0
+        self._qcache_file_rows = 0
+        self._qcache_lock = threading.Lock()
+        self._qcache_file_lock = threading.Lock()
+        self._qcache_header = json.dumps({"settings": self._generation_settings_key()}) + "\n"
+        self._dimension = None
         
+    def _load_torch_embeddings(self, device: str) -> HuggingFaceEmbeddings:
+        """Load the sentence-transformers model on device (FP16 on CUDA), falling back to CPU"""
+        encode_kwargs = {
+            'normalize_embeddings': True,
+            'batch_size': config.TORCH_ENCODE_BATCH_SIZE,
+            'convert_to_numpy': True,
+            'precision': 'float32'
+        }
+        try:
+            embeddings = HuggingFaceEmbeddings(
+                model_name=config.EMBEDDING_MODEL,
+                model_kwargs={'device': device},
+                encode_kwargs=encode_kwargs
+            )
+            if device == "cuda":
+                sentence_transformer(embeddings).half()
+        except Exception as e:
+            if device == "cpu":
+                raise
+            if self.verbose:
+                print(f"⚠️ Could not load embedding model on {device} ({e}), using CPU")
+            device = "cpu"
+            embeddings = HuggingFaceEmbeddings(
+                model_name=config.EMBEDDING_MODEL,
+                model_kwargs={'device': device},
+                encode_kwargs=encode_kwargs
+            )
+        if config.EMBEDDING_MAX_SEQ_LENGTH is not None:
+            sentence_transformer(embeddings).max_seq_length = config.EMBEDDING_MAX_SEQ_LENGTH
+        if config.TORCH_COMPILE:
+            self._compile_embeddings(embeddings)
         if self.verbose:
-            print(f"✅ Loaded {len(documents)} pages")
+            print(f"   Embedding device: {device}")
+        return embeddings
+    
+    def _compile_embeddings(self, embeddings: HuggingFaceEmbeddings):
+        """Compile the transformer forward pass with torch.compile, keeping eager mode on failure"""
+        if not hasattr(torch, "compile"):  # torch < 2.0
+            return
+        transformer = sentence_transformer(embeddings)[0]
+        eager_model = transformer.auto_model
+        try:
+            # Default mode (no CUDA graphs): "reduce-overhead" records a CUDA graph per padded
+            # input length, and that graph state is per-thread, which Streamlit reruns and
+            # asyncio.to_thread keep changing. dynamic=True compiles one kernel set for all
+            # sequence lengths and batch sizes
+            transformer.auto_model = torch.compile(eager_model, dynamic=True)
+            # Compilation happens on the first call; trigger it here so failures surface now
+            embeddings.embed_query("warmup")
+        except Exception as e:
+            transformer.auto_model = eager_model
+            if self.verbose:
+                print(f"⚠️ torch.compile failed ({e}), using eager mode")
+        
+    @staticmethod
+    def _normalize_question(question: str) -> str:
+        """Normalize a question so trivially different spellings share cache entries"""
+        return " ".join(question.lower().split())
+    
+    def _embed_query(self, question: str) -> tuple:
+        """Embed a normalized question (wrapped by an LRU cache in __init__)"""
+        return tuple(self.embeddings.embed_query(question))
+    
+    def _retrieve(self, question: str) -> tuple:
+        """Retrieve the chunks for a normalized question, trimmed to the relevant ones"""
+        embedding = list(self._embed_cached(question))
+        scored = self._search_with_scores(embedding, config.CANDIDATE_K)
+        return tuple(self._trim_context(scored))
+    
+    def _search_with_scores(self, embedding, k: int):
+        """Return the k nearest chunks as (Document, cosine similarity), best first"""
+        if config.VECTOR_STORE in ("array", "faiss"):
+            # Array and FAISS (inner product) stores already score by similarity
+            return self.vectorstore.similarity_search_with_score_by_vector(embedding, k=k)
+        
+        # Query the collection directly (no filter needed) and convert distances to similarities
+        collection = self.vectorstore._collection
+        results = collection.query(
+            query_embeddings=[embedding],
+            n_results=k,
+            include=["documents", "metadatas", "distances"]
+        )
+        space = (collection.metadata or {}).get("hnsw:space", "l2")
+        scale = 0.5 if space == "l2" else 1.0
+        return [
+            (Document(page_content=text, metadata=metadata or {}), 1.0 - scale * distance)
+            for text, metadata, distance in zip(
+                results["documents"][0], results["metadatas"][0], results["distances"][0]
+            )
+        ]
+    
+    @staticmethod
+    def _trim_context(scored):
+        """Keep MIN_K..MAX_K chunks, dropping those far less similar than the best match"""
+        if not scored:
+            return []
+        cutoff = scored[0][1] * config.RELEVANCE_RATIO
+        docs = [doc for i, (doc, score) in enumerate(scored) if i < config.MIN_K or score >= cutoff]
+        return docs[:config.MAX_K]
+    
+    def _embedding_dimension(self) -> int:
+        """Length of the vectors produced by the embedding model"""
+        if self._dimension is None:
+            self._dimension = len(self.embeddings.embed_query("dimension"))
+        return self._dimension
+    
+    def _store_info_path(self):
+        """JSON file recording which embedding model built the persisted vector store"""
+        return os.path.join(self.persist_directory, STORE_INFO_FILE)
+    
+    def _save_store_info(self):
+        """Record the embedding model and dimension next to the vector store"""
+        with open(self._store_info_path(), "w", encoding="utf-8") as f:
+            json.dump({
+                "embedding_model": config.EMBEDDING_MODEL,
+                "dimension": self._embedding_dimension()
+            }, f)
+    
+    def _store_matches_embeddings(self) -> bool:
+        """Whether the persisted store was built with the current embedding model"""
+        path = self._store_info_path()
+        if not os.path.exists(path):  # Built before store_info.json was written
+            return False
+        with open(path, encoding="utf-8") as f:
+            info = json.load(f)
+        return (
+            info.get("embedding_model") == config.EMBEDDING_MODEL
+            and info.get("dimension") == self._embedding_dimension()
+        )
+    
+    def _clear_query_cache(self):
+        """Drop cached retrieval results (embeddings stay valid across stores)"""
+        self._retrieve_cached.cache_clear()
+    
+    def _query_cache_path(self):
+        """JSON-lines file: a generation-settings header, then cached answers oldest first"""
+        return os.path.join(self.persist_directory, "query_cache.jsonl")
+    
+    def _generation_settings_key(self) -> str:
+        """Hash of the settings that shape an answer; cache files written under others are stale"""
+        settings = [
+            self.model.model_name,
+            PROMPT_HEAD,
+            PROMPT_TAIL,
+            config.TEMPERATURE,
+            config.CANDIDATE_K,
+            config.MIN_K,
+            config.MAX_K,
+            config.RELEVANCE_RATIO
+        ]
+        return hashlib.blake2b(json.dumps(settings).encode("utf-8"), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _encode_cache_entry(embedding: np.ndarray, result: dict) -> str:
+        """Serialize one cached answer as a single JSON line"""
+        return json.dumps({
+            "embedding": embedding.tolist(),
+            "answer": result["answer"],
+            "source_documents": [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in result["source_documents"]
+            ]
+        })
+    
+    def _decode_cache_entry(self, line: str):
+        """Parse one cache line, or return None if it is truncated or from another model"""
+        if not line.endswith("\n"):  # Interrupted append
+            return None
+        try:
+            entry = json.loads(line)
+            embedding = np.asarray(entry["embedding"], dtype=np.float32)
+            result = {
+                "answer": entry["answer"],
+                "source_documents": [Document(**doc) for doc in entry["source_documents"]]
+            }
+        except (ValueError, KeyError, TypeError):
+            return None
+        if embedding.shape != (self._embedding_dimension(),):
+            return None
+        return embedding, result
+    
+    def _load_query_cache(self):
+        """Load the semantic answer cache saved alongside the vector store, skipping bad lines"""
+        with self._qcache_lock:
+            self._qcache_emb = None
+            self._qcache_entries = []
+            self._qcache_next = 0
+        
+        path = self._query_cache_path()
+        with self._qcache_file_lock:
+            lines = []
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            # The first line records the generation settings; answers made under others are stale
+            stale = bool(lines) and lines[0] != self._qcache_header
+            if stale and self.verbose:
+                print("⚠️ Generation settings changed, discarding cached answers")
+            lines = [] if stale else lines[1:]
+            # A killed process can leave a truncated last line; drop it rather than fail
+            entries = []
+            valid_lines = []
+            for line in lines:
+                entry = self._decode_cache_entry(line)
+                if entry is not None:
+                    entries.append(entry)
+                    valid_lines.append(line)
+            if self.verbose and len(entries) < len(lines):
+                print(f"⚠️ Skipped {len(lines) - len(entries)} unreadable query cache entries")
+            self._qcache_file_rows = len(lines)
+            if stale or len(entries) < len(lines) or len(lines) > config.QUERY_CACHE_SIZE:
+                self._compact_query_cache(valid_lines)
+        
+        for embedding, result in entries[-config.QUERY_CACHE_SIZE:]:
+            self._insert_answer(embedding, result)
+    
+    def _compact_query_cache(self, lines=None):
+        """
+        Rewrite the cache file with only its newest QUERY_CACHE_SIZE entries (hold the file lock)
+        
+        Args:
+            lines: Entry lines to keep the newest of (default: the file's current entries)
+        """
+        path = self._query_cache_path()
+        if lines is None:
+            with open(path, encoding="utf-8") as f:
+                lines = f.readlines()[1:]
+        lines = lines[-config.QUERY_CACHE_SIZE:]
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self._qcache_header)
+            f.writelines(lines)
+        os.replace(path + ".tmp", path)
+        self._qcache_file_rows = len(lines)
+    
+    def _reset_query_cache(self):
+        """Forget cached answers (they refer to the previous vector store)"""
+        with self._qcache_lock:
+            self._qcache_emb = None
+            self._qcache_entries = []
+            self._qcache_next = 0
+        with self._qcache_file_lock:
+            path = self._query_cache_path()
+            if os.path.exists(path):
+                os.remove(path)
+            self._qcache_file_rows = 0
+    
+    def _lookup_answer(self, embedding: np.ndarray):
+        """Return a cached result whose question is cosine-similar enough to embedding"""
+        with self._qcache_lock:
+            if not self._qcache_entries:
+                return None
+            scores = self._qcache_emb[:len(self._qcache_entries)] @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < config.SEMANTIC_CACHE_THRESHOLD:
+                return None
+            entry = self._qcache_entries[best]
+        return {"answer": entry["answer"], "source_documents": list(entry["source_documents"])}
+    
+    def _insert_answer(self, embedding: np.ndarray, result: dict):
+        """Put a result in the in-memory cache, overwriting the oldest row once full"""
+        with self._qcache_lock:
+            if self._qcache_emb is None:
+                self._qcache_emb = np.empty((config.QUERY_CACHE_SIZE, len(embedding)), dtype=np.float32)
+            if len(self._qcache_entries) < config.QUERY_CACHE_SIZE:
+                row = len(self._qcache_entries)
+                self._qcache_entries.append(result)
+            else:
+                row = self._qcache_next
+                self._qcache_entries[row] = result
+            self._qcache_emb[row] = embedding
+            self._qcache_next = (row + 1) % config.QUERY_CACHE_SIZE
+    
+    def _store_answer(self, embedding: np.ndarray, result: dict):
+        """Add a result to the semantic answer cache and append it to the cache file"""
+        self._insert_answer(embedding, result)
         
-        # Split documents into chunks
+        # Only the new entry is written; the file is compacted once it holds twice the cache size
+        line = self._encode_cache_entry(embedding, result)
+        with self._qcache_file_lock:
+            path = self._query_cache_path()
+            new_file = not os.path.exists(path)
+            with open(path, "a", encoding="utf-8") as f:
+                if new_file:
+                    f.write(self._qcache_header)
+                f.write(line + "\n")
+            self._qcache_file_rows += 1
+            if self._qcache_file_rows >= 2 * config.QUERY_CACHE_SIZE:
+                self._compact_query_cache()
+    
+    def warmup(self, questions):
+        """Pre-embed and pre-retrieve questions (e.g. the UI's sample questions) into the caches"""
+        if not self.vectorstore:
+            raise ValueError("Vector store not initialized. Call initialize() first.")
+        for question in questions:
+            self._retrieve_cached(self._normalize_question(question))
+        
+    def load_and_process_pdf(self):
+        """Load PDF and split into chunks (memoized on disk per PDF version and chunk settings)"""
         if self.verbose:
-            print("✂️ Splitting documents into chunks...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+            print("📄 Loading PDF and splitting into chunks...")
+        stat = os.stat(self.pdf_path)
+        page_count, chunk_data = _load_chunks(
+            self.pdf_path,
+            stat.st_mtime,
+            stat.st_size,
+            config.CHUNK_SIZE,
+            config.CHUNK_OVERLAP,
+            SPLITTER_KEY
         )
+        chunks = [Document(page_content=text, metadata=metadata) for text, metadata in chunk_data]
         
-        chunks = text_splitter.split_documents(documents)
         if self.verbose:
+            print(f"✅ Loaded {page_count} pages")
             print(f"✅ Created {len(chunks)} chunks")
         
         return chunks
     
     def create_vectorstore(self, chunks):
-        """Create ChromaDB vectorstore from chunks"""
+        """Create the configured vectorstore from chunks"""
         if self.verbose:
             print("🗄️ Creating vector store...")
             print("⏳ This may take a few minutes for the first run...")
         
-        self.vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory
-        )
+        unique_chunks = self._deduplicate(chunks)
+        if self.verbose and len(unique_chunks) < len(chunks):
+            print(f"   Skipped {len(chunks) - len(unique_chunks)} duplicate chunks")
+        chunks = unique_chunks
+        
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        embeddings = self._embed_documents(texts)
+        
+        # Pass precomputed embeddings straight to the store so it doesn't re-embed
+        if config.VECTOR_STORE == "chroma":
+            self._create_chroma(texts, embeddings, metadatas)
+        elif config.VECTOR_STORE == "faiss":
+            self._create_faiss(texts, embeddings, metadatas)
+        elif config.VECTOR_STORE == "array":
+            self.vectorstore = ArrayVectorStore.create(
+                self.persist_directory,
+                texts,
+                embeddings,
+                metadatas,
+                dtype=config.EMBEDDING_STORAGE_DTYPE
+            )
+        self._save_store_info()
+        self._clear_query_cache()
+        self._reset_query_cache()
         
         if self.verbose:
             print(f"✅ Vector store created with {len(chunks)} embeddings")
         
+    @staticmethod
+    def _deduplicate(chunks):
+        """
+        Drop chunks whose normalized text repeats an earlier chunk (e.g. page headers)
+        
+        The first occurrence is kept; if the text appears on several pages, they are
+        listed in its "pages" metadata as a comma-separated string (Chroma only accepts
+        scalar metadata values).
+        """
+        first_chunks = {}
+        pages = {}
+        for chunk in chunks:
+            normalized = " ".join(chunk.page_content.lower().split())
+            key = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+            if key not in first_chunks:
+                first_chunks[key] = chunk
+                pages[key] = []
+            page = chunk.metadata.get("page")
+            if page is not None and page not in pages[key]:
+                pages[key].append(page)
+        
+        unique_chunks = []
+        for key, chunk in first_chunks.items():
+            metadata = dict(chunk.metadata)
+            if len(pages[key]) > 1:
+                metadata["pages"] = ", ".join(str(page) for page in pages[key])
+            unique_chunks.append(Document(page_content=chunk.page_content, metadata=metadata))
+        return unique_chunks
+        
+    def _create_chroma(self, texts, embeddings, metadatas):
+        """Write precomputed embeddings to a persistent Chroma collection in batches"""
+        client = chromadb.PersistentClient(path=self.persist_directory)
+        
+        # Start from an empty collection so a forced reload doesn't duplicate chunks
+        client.get_or_create_collection(config.CHROMA_COLLECTION)
+        client.delete_collection(config.CHROMA_COLLECTION)
+        collection = client.create_collection(
+            config.CHROMA_COLLECTION,
+            metadata={"hnsw:space": "cosine"}
+        )
+        
+        ids = [f"chunk-{i}" for i in range(len(texts))]
+        for start in range(0, len(texts), config.CHROMA_BATCH_SIZE):
+            end = start + config.CHROMA_BATCH_SIZE
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end]
+            )
+        
+        self.vectorstore = self._open_chroma(client)
+        
+    def _open_chroma(self, client=None):
+        """Wrap the persistent Chroma collection in a LangChain vector store"""
+        return Chroma(
+            client=client or chromadb.PersistentClient(path=self.persist_directory),
+            collection_name=config.CHROMA_COLLECTION,
+            embedding_function=self.embeddings
+        )
+        
+    def _create_faiss(self, texts, embeddings, metadatas):
+        """Build an inner-product FAISS index (cosine, as embeddings are normalized) and save it"""
+        dimension = len(embeddings[0])
+        fp16 = config.EMBEDDING_STORAGE_DTYPE == "float16"
+        if config.FAISS_INDEX == "hnsw" and fp16:
+            index = faiss.IndexHNSWSQ(
+                dimension, faiss.ScalarQuantizer.QT_fp16, config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+        elif config.FAISS_INDEX == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, config.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        elif fp16:
+            index = faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+            )
+        else:
+            index = faiss.IndexFlatIP(dimension)
+        
+        self.vectorstore = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+        )
+        self.vectorstore.add_embeddings(
+            text_embeddings=list(zip(texts, embeddings)),
+            metadatas=metadatas
+        )
+        self.vectorstore.save_local(self.persist_directory)
+        
+    def _embed_documents(self, texts):
+        """Embed texts in length-sorted batches (less padding per batch), keeping input order"""
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), config.EMBEDDING_BATCH_SIZE):
+            batch = order[start:start + config.EMBEDDING_BATCH_SIZE]
+            vectors = self.embeddings.embed_documents([texts[i] for i in batch])
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+            if self.verbose:
+                print(f"   Embedded {min(start + len(batch), len(texts))}/{len(texts)} chunks")
+        return embeddings
+        
     def load_vectorstore(self):
         """Load existing vectorstore"""
         if self.verbose:
             print("📂 Loading existing vector store...")
         
-        self.vectorstore = Chroma(
-            persist_directory=self.persist_directory,
-            embedding_function=self.embeddings
-        )
+        if config.VECTOR_STORE == "chroma":
+            self.vectorstore = self._open_chroma()
+        elif config.VECTOR_STORE == "faiss":
+            # The index is written by create_vectorstore, so unpickling the docstore is safe
+            self.vectorstore = FAISS.load_local(
+                self.persist_directory,
+                self.embeddings,
+                allow_dangerous_deserialization=True,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+            )
+        elif config.VECTOR_STORE == "array":
+            self.vectorstore = ArrayVectorStore.load(self.persist_directory)
+        self._clear_query_cache()
+        self._load_query_cache()
         
         if self.verbose:
             print("✅ Vector store loaded")
         
-    def query(self, question: str):
-        """Query the RAG system"""
+    def _embed_and_lookup(self, question: str):
+        """
+        Embed the question and look it up in the semantic answer cache
+        
+        Returns:
+            (normalized question, query embedding, cached result or None)
+        """
         if not self.vectorstore:
             raise ValueError("Vector store not initialized. Call initialize() first.")
         
-        # Retrieve relevant documents
-        retriever = self.vectorstore.as_retriever(search_kwargs={"k": config.TOP_K})
-        relevant_docs = retriever.invoke(question)
+        # Answer from the semantic cache if a near-identical question was already asked
+        normalized = self._normalize_question(question)
+        query_embedding = np.asarray(self._embed_cached(normalized), dtype=np.float32)
+        return normalized, query_embedding, self._lookup_answer(query_embedding)
+    
+    def _retrieve_context(self, question: str, normalized: str):
+        """
+        Retrieve the relevant chunks and build the prompt
         
-        # Build context from retrieved documents
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        Returns:
+            (relevant docs, prompt)
+        """
+        # Retrieve relevant documents (cached per normalized question)
+        relevant_docs = list(self._retrieve_cached(normalized))
+        return relevant_docs, self._build_prompt(question, relevant_docs)
+    
+    def _prepare_query(self, question: str):
+        """
+        Embed the question and either find a cached answer or build the prompt
+        
+        Returns:
+            (query embedding, cached result or None, relevant docs, prompt)
+        """
+        normalized, query_embedding, cached = self._embed_and_lookup(question)
+        if cached is not None:
+            return query_embedding, cached, None, None
+        relevant_docs, prompt = self._retrieve_context(question, normalized)
+        return query_embedding, None, relevant_docs, prompt
+    
+    @staticmethod
+    def _build_prompt(question: str, relevant_docs) -> str:
+        """Write the prompt in one pass instead of joining the context and copying it again"""
+        buffer = io.StringIO()
+        buffer.write(PROMPT_HEAD)
+        for i, doc in enumerate(relevant_docs):
+            if i:
+                buffer.write("\n\n")
+            buffer.write(doc.page_content)
+        buffer.write(PROMPT_TAIL.format(question=question))
+        return buffer.getvalue()
+    
+    def query(self, question: str, stream: bool = False):
+        """
+        Query the RAG system
+        
+        Args:
+            question: Question about the book
+            stream: If True, return a generator that first yields the list of source
+                documents and then the answer text chunk by chunk as Gemini produces it
+        """
+        query_embedding, cached, relevant_docs, prompt = self._prepare_query(question)
+        if cached is not None:
+            return self._replay_answer(cached) if stream else cached
         
-        # Create prompt
-        prompt = f"""You are an expert on the book "The War of the Worlds" by H.G. Wells.
-Use the following pieces of context from the book to answer the question at the end.
-If you don't know the answer based on the context, just say that you don't know, don't try to make up an answer.
-Always answer in English and provide detailed, accurate responses based on the book's content.
-
-Context from the book:
-{context}
-
-Question: {question}
-
-Detailed Answer:"""
-
         # Generate answer using Gemini
-        generation_config = genai.types.GenerationConfig(
-            temperature=config.TEMPERATURE
-        )
+        if stream:
+            response = self.model.generate_content(
+                prompt,
+                generation_config=self.generation_config,
+                stream=True
+            )
+            return self._stream_answer(response, relevant_docs, query_embedding)
         
         response = self.model.generate_content(
             prompt,
-            generation_config=generation_config
+            generation_config=self.generation_config
         )
         
-        return {
+        result = {
             "answer": response.text,
             "source_documents": relevant_docs
         }
+        self._store_answer(query_embedding, result)
+        return result
+    
+    async def query_async(self, question: str):
+        """
+        Query the RAG system as awaitable stages (embed, search, generate)
+        
+        Embedding and search run in worker threads and Gemini is awaited, so when several
+        questions are gathered, one question's CPU work overlaps the others' network time.
+        """
+        normalized, query_embedding, cached = await self._embed_async(question)
+        if cached is not None:
+            return cached
+        
+        relevant_docs, prompt = await self._search_async(question, normalized)
+        answer = await self._generate_async(prompt)
+        
+        result = {
+            "answer": answer,
+            "source_documents": relevant_docs
+        }
+        await asyncio.to_thread(self._store_answer, query_embedding, result)
+        return result
+    
+    async def _embed_async(self, question: str):
+        """Embed stage: _embed_and_lookup, run off the event loop"""
+        return await asyncio.to_thread(self._embed_and_lookup, question)
+    
+    async def _search_async(self, question: str, normalized: str):
+        """Search stage: _retrieve_context, run off the event loop"""
+        return await asyncio.to_thread(self._retrieve_context, question, normalized)
+    
+    async def _generate_async(self, prompt: str) -> str:
+        """Generate stage: await Gemini's answer"""
+        response = await self.model.generate_content_async(
+            prompt,
+            generation_config=self.generation_config
+        )
+        return response.text
+    
+    def _stream_answer(self, response, relevant_docs, query_embedding):
+        """Yield the sources, then Gemini's text chunks; cache the full answer at the end"""
+        yield relevant_docs
+        parts = []
+        for chunk in response:
+            parts.append(chunk.text)
+            yield chunk.text
+        self._store_answer(query_embedding, {
+            "answer": "".join(parts),
+            "source_documents": relevant_docs
+        })
+    
+    @staticmethod
+    def _replay_answer(result):
+        """Yield a cached result in the same shape as _stream_answer"""
+        yield result["source_documents"]
+        yield result["answer"]
     
     def initialize(self, force_reload: bool = False):
         """Initialize the entire RAG system"""
         
-        # Check if vectorstore exists
-        if os.path.exists(self.persist_directory) and not force_reload:
+        # Check if vectorstore exists and was built with the current embedding model
+        exists = os.path.exists(self.persist_directory)
+        if exists and not force_reload and self._store_matches_embeddings():
             if self.verbose:
                 print("📂 Vector store already exists. Loading...")
             self.load_vectorstore()
         else:
+            if exists and not force_reload and self.verbose:
+                print(f"⚠️ Vector store was not built with {config.EMBEDDING_MODEL}, rebuilding...")
             if self.verbose:
                 print("🔄 Creating new vector store...")
             chunks = self.load_and_process_pdf()
@@ -154,6 +833,14 @@ Detailed Answer:"""
             print("\n🎉 RAG System initialized successfully!\n")
 
 
+async def _run_questions(rag: RAGSystem, questions):
+    """Run questions concurrently, returning each result or the exception it raised"""
+    return await asyncio.gather(
+        *[rag.query_async(question) for question in questions],
+        return_exceptions=True
+    )
+
+
 def main():
     """Main function for testing"""
     
@@ -177,19 +864,19 @@ def main():
     print("Testing RAG System with sample questions")
     print("="*80)
     
-    for question in test_questions:
+    # Ask all questions concurrently; results come back in question order
+    results = asyncio.run(_run_questions(rag, test_questions))
+    
+    for question, result in zip(test_questions, results):
         print(f"\n❓ Question: {question}")
         print("-"*80)
         
-        try:
-            result = rag.query(question)
-            
+        if isinstance(result, Exception):
+            print(f"❌ Error: {str(result)}")
+            traceback.print_exception(type(result), result, result.__traceback__)
+        else:
             print(f"💡 Answer: {result['answer']}")
             print(f"\n📚 Sources: {len(result['source_documents'])} relevant chunks found")
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
-            import traceback
-            traceback.print_exc()
         
         print("="*80)
 
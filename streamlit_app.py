@@ -3,7 +3,7 @@ Streamlit UI for War of the Worlds RAG System
 """
 
 import streamlit as st
-from rag_system import RAGSystem
+from rag_system import RAGSystem, VECTOR_STORES
 import config
 
 # Page configuration
@@ -51,10 +51,39 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+sample_questions = [
+    "Who is the narrator?",
+    "What is the main plot of the story?",
+    "How do the Martians attack Earth?",
+    "What happens to the Martians in the end?",
+    "Who is the artilleryman?",
+    "What is the red weed?",
+]
+
+
+@st.cache_resource(show_spinner="🚀 Initializing RAG System... This may take a minute...")
+def get_rag() -> RAGSystem:
+    """Build the RAG system once per process and share it across sessions"""
+    rag = RAGSystem(pdf_path="The_War_of_the_Worlds_NT.pdf", verbose=False)
+    rag.initialize(force_reload=False)
+    rag.warmup(sample_questions)
+    return rag
+
+
+def render_sources(sources):
+    """Show the retrieved chunks as source cards in an expander"""
+    with st.expander(f"📚 View {len(sources)} Source Chunks"):
+        for i, doc in enumerate(sources, 1):
+            st.markdown(f"""
+            <div class="source-box">
+            <strong>Source {i} (Page {doc.metadata.get('pages', doc.metadata.get('page', 'N/A'))}):</strong><br>
+            {doc.page_content[:300]}...
+            </div>
+            """, unsafe_allow_html=True)
+
+
 # Initialize session state
-if 'rag_system' not in st.session_state:
-    st.session_state.rag_system = None
-    st.session_state.initialized = False
+if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
 
 # Header
@@ -66,48 +95,36 @@ with st.sidebar:
     st.header("⚙️ Configuration")
     st.info(f"""
     **LLM:** Gemini Pro  
-    **Embeddings:** Gemini Embeddings  
-    **Vector DB:** ChromaDB  
+    **Embeddings:** {config.EMBEDDING_MODEL.split('/')[-1]}  
+    **Vector DB:** {VECTOR_STORES.get(config.VECTOR_STORE, config.VECTOR_STORE)}  
     **Chunks:** {config.CHUNK_SIZE} chars  
-    **Top K:** {config.TOP_K} results
+    **Top K:** {config.MIN_K}–{config.MAX_K} results
     """)
+    st.caption(
+        "MiniLM-L6 (384-d) embeds about twice as fast as MPNet (768-d) and halves the index, "
+        "at slightly lower retrieval quality. Switch with EMBEDDING_MODEL in config.py."
+    )
     
     st.divider()
     
     if st.button("🔄 Reload Vector Database", use_container_width=True):
-        st.session_state.rag_system = None
-        st.session_state.initialized = False
+        get_rag.clear()
         st.session_state.chat_history = []
         st.success("Ready to reload!")
     
     st.divider()
     
     st.header("📖 Sample Questions")
-    sample_questions = [
-        "Who is the narrator?",
-        "What is the main plot of the story?",
-        "How do the Martians attack Earth?",
-        "What happens to the Martians in the end?",
-        "Who is the artilleryman?",
-        "What is the red weed?",
-    ]
-    
     for q in sample_questions:
         if st.button(q, use_container_width=True):
             st.session_state.current_question = q
 
-# Initialize RAG system
-if not st.session_state.initialized:
-    with st.spinner("🚀 Initializing RAG System... This may take a minute..."):
-        try:
-            rag = RAGSystem(pdf_path="The_War_of_the_Worlds_NT.pdf", verbose=False)
-            rag.initialize(force_reload=False)
-            st.session_state.rag_system = rag
-            st.session_state.initialized = True
-            st.success("✅ RAG System initialized successfully!")
-        except Exception as e:
-            st.error(f"❌ Error initializing RAG system: {str(e)}")
-            st.stop()
+# Initialize RAG system (shared by all sessions)
+try:
+    rag = get_rag()
+except Exception as e:
+    st.error(f"❌ Error initializing RAG system: {str(e)}")
+    st.stop()
 
 # Main content
 st.divider()
@@ -133,19 +150,30 @@ with col2:
 
 # Process question
 if (ask_button or question) and question.strip():
-    with st.spinner("🤔 Thinking..."):
-        try:
-            result = st.session_state.rag_system.query(question)
-            
-            # Add to chat history
-            st.session_state.chat_history.append({
-                "question": question,
-                "answer": result["answer"],
-                "sources": result["source_documents"]
-            })
-            
-        except Exception as e:
-            st.error(f"❌ Error: {str(e)}")
+    try:
+        with st.spinner("🤔 Thinking..."):
+            stream = rag.query(question, stream=True)
+            sources = next(stream)
+        
+        # Gemini is already generating: show the sources right away, then stream the
+        # answer as it arrives. Both move into the history once complete
+        live_answer = st.empty()
+        with live_answer.container():
+            st.markdown(f'<div class="question-box"><strong>❓ Question:</strong> {question}</div>', unsafe_allow_html=True)
+            render_sources(sources)
+            st.markdown("**💡 Answer:**")
+            answer = st.write_stream(stream)
+        live_answer.empty()
+        
+        # Add to chat history
+        st.session_state.chat_history.append({
+            "question": question,
+            "answer": answer,
+            "sources": sources
+        })
+        
+    except Exception as e:
+        st.error(f"❌ Error: {str(e)}")
 
 # Display chat history (most recent first)
 if st.session_state.chat_history:
@@ -158,14 +186,7 @@ if st.session_state.chat_history:
             st.markdown(f'<div class="answer-box"><strong>💡 Answer:</strong><br>{item["answer"]}</div>', unsafe_allow_html=True)
             
             # Show sources in expander
-            with st.expander(f"📚 View {len(item['sources'])} Source Chunks"):
-                for i, doc in enumerate(item["sources"], 1):
-                    st.markdown(f"""
-                    <div class="source-box">
-                    <strong>Source {i} (Page {doc.metadata.get('page', 'N/A')}):</strong><br>
-                    {doc.page_content[:300]}...
-                    </div>
-                    """, unsafe_allow_html=True)
+            render_sources(item["sources"])
             
             st.divider()
 else: